@@ -0,0 +1,245 @@
+"""
+Shared helpers for the loadtest locustfiles.
+
+One copy of the hot-path code matters beyond maintenance: CPython 3.11+
+specializes bytecode per code object, so a single shared consume_sse /
+record_cost gets specialized once instead of once per duplicated copy.
+
+Locust puts the locustfile's directory on sys.path, so locustfiles import
+this module as `from _common import ...`.
+"""
+
+import collections
+import json
+import os
+import threading
+import time
+
+from locust import events
+
+try:
+    # Optional: ~3-5x faster serialization that emits bytes directly,
+    # skipping the separate .encode() step.
+    import orjson
+
+    def dumps_bytes(obj):
+        """Serialize obj to JSON bytes."""
+        return orjson.dumps(obj)
+
+    def loads_bytes(data):
+        """Parse JSON from bytes — takes resp.content with no str decode."""
+        return orjson.loads(data)
+except ImportError:
+    def dumps_bytes(obj):
+        """Serialize obj to JSON bytes (stdlib fallback)."""
+        return json.dumps(obj).encode()
+
+    def loads_bytes(data):
+        """Parse JSON from bytes (stdlib fallback)."""
+        return json.loads(data)
+
+
+MODEL = os.getenv("QLITE_TEST_MODEL", "gpt-4o-mini")
+API_KEY = os.getenv("OPENAI_API_KEY", "test-key")
+
+HEADERS = {
+    "Content-Type": "application/json",
+    "Authorization": f"Bearer {API_KEY}",
+    # Responses are small JSON/SSE; skipping gzip negotiation avoids a
+    # decompress step in the client.
+    "Accept-Encoding": "identity",
+    # Sockets must be reused — a fresh TCP handshake per request would
+    # dominate the measured latencies and hide the proxy overhead.
+    "Connection": "keep-alive",
+}
+
+
+def chat_body(messages, stream=False, max_tokens=10):
+    """Serialize an OpenAI-format chat payload to bytes.
+
+    Call at module scope for constant payloads so tasks post precomputed
+    bytes instead of re-running json.dumps per request.
+    """
+    payload = {"model": MODEL, "messages": messages, "max_tokens": max_tokens}
+    if stream:
+        payload["stream"] = True
+    return dumps_bytes(payload)
+
+
+# ---------------------------------------------------------------------------
+# Cost & cache counters
+# ---------------------------------------------------------------------------
+
+# Hit/miss counts are lock-free: a single `Counter[key] += 1` is one
+# STORE_SUBSCR under the GIL, so greenlets can't interleave mid-increment.
+# The float accumulators are not atomic under `+=` and stay behind the lock.
+_counts = collections.Counter()
+_total_cost = 0.0
+_total_saved = 0.0
+_stats_lock = threading.Lock()
+
+
+def record_cost(cache_header, cost, cost_saved):
+    global _total_cost, _total_saved
+    _counts["hit" if cache_header == "HIT" else "miss"] += 1
+    with _stats_lock:
+        _total_cost += cost
+        _total_saved += cost_saved
+
+
+def record_proxy_cost(resp):
+    """Extract cost headers from a proxy response and record them."""
+    h = resp.headers
+    cost_hdr = h.get("X-Request-Cost")
+    saved_hdr = h.get("X-Cost-Saved")
+    # When a header is absent, 0.0 is the cached float singleton — no
+    # string-to-float parse of a literal "0" default.
+    cost = float(cost_hdr) if cost_hdr else 0.0
+    cost_saved = float(saved_hdr) if saved_hdr else 0.0
+    record_cost(h.get("X-Cache", "MISS"), cost, cost_saved)
+
+
+def print_cost_summary(target_hit_rate=None):
+    """Print the end-of-test cost summary; call from a test_stop listener."""
+    hits = _counts["hit"]
+    misses = _counts["miss"]
+    total = hits + misses
+    if total == 0:
+        print("\n=== Cost Savings Summary ===")
+        print("No proxy requests recorded.")
+        print("============================\n")
+        return
+
+    hit_rate = (hits / total) * 100
+    cost_without_cache = _total_cost + _total_saved
+    savings_pct = (_total_saved / cost_without_cache * 100) if cost_without_cache > 0 else 0.0
+
+    print("\n=== Cost Savings Summary ===")
+    if target_hit_rate is not None:
+        print(f"Target hit rate:         {target_hit_rate}%")
+    print(f"Cache hits:              {hits}")
+    print(f"Cache misses:            {misses}")
+    print(f"Hit rate:                {hit_rate:.1f}%")
+    print(f"Total API cost (actual): ${_total_cost:.8f}")
+    print(f"Total saved:             ${_total_saved:.8f}")
+    print(f"Cost without cache:      ${cost_without_cache:.8f}")
+    print(f"Savings:                 {savings_pct:.1f}%")
+    print("============================\n")
+
+
+# ---------------------------------------------------------------------------
+# Metric events
+# ---------------------------------------------------------------------------
+
+# Locust only copies `context` when it's non-empty, so one shared read-only
+# dict avoids an allocation per emitted event.
+_EMPTY_CTX = {}
+
+
+def fire(name, rt, rtype="SSE", exc=None, rl=0):
+    """Emit one Locust request event without rebuilding the kwargs plumbing."""
+    events.request.fire(
+        request_type=rtype,
+        name=name,
+        response_time=rt,
+        response_length=rl,
+        exception=exc,
+        context=_EMPTY_CTX,
+    )
+
+
+# ---------------------------------------------------------------------------
+# SSE streaming
+# ---------------------------------------------------------------------------
+
+# SSE framing constant — scanned as raw bytes so the hot loop never
+# allocates a str.
+DONE = b"data: [DONE]"
+
+
+def consume_sse(resp, done_marker=DONE):
+    """Drain an SSE stream; returns (first_chunk_time, got_done).
+
+    TTFB is taken on arrival of the first body chunk — which is what the
+    metric should measure. After that the only job left is spotting the
+    end-of-stream marker, so there is no per-line Python loop at all: each
+    large read is scanned with the `in` operator (C-level memmem), and a
+    sliding tail of marker-length-minus-one bytes catches a marker split
+    across chunk boundaries.
+
+    done_marker is the line that terminates the stream (OpenAI's
+    `data: [DONE]` by default; Anthropic uses `event: message_stop`). Pass
+    None for streams that simply end at EOF, like Gemini's.
+    """
+    pc = time.perf_counter  # LOAD_FAST beats LOAD_GLOBAL+LOAD_ATTR per call
+    first_chunk_time = None
+    got_done = False
+    tail = b""
+    keep = len(done_marker) - 1 if done_marker is not None else 0
+    for chunk in resp.iter_content(chunk_size=65536, decode_content=False):
+        if first_chunk_time is None:
+            first_chunk_time = pc()
+        if done_marker is None:
+            continue  # EOF-terminated stream: just drain
+        window = tail + chunk
+        if done_marker in window:
+            got_done = True
+            break
+        tail = window[-keep:]
+    if done_marker is None:
+        got_done = first_chunk_time is not None
+    return first_chunk_time, got_done
+
+
+def run_stream(client, url, body, headers_name, ttfb_name, total_name,
+               total_rtype="SSE", record_cost_headers=False,
+               headers=HEADERS, done_marker=DONE):
+    """Run one streaming chat completion and emit TTFB/total metrics.
+
+    Locust itself records time-to-headers under `headers_name`; the custom
+    TTFB/total events measure from request start to first body chunk and to
+    the end-of-stream marker respectively (see consume_sse for done_marker
+    semantics).
+    """
+    pc = time.perf_counter
+    start = pc()
+    first_chunk_time = None
+    got_done = False
+    try:
+        with client.request(
+            "POST",
+            url,
+            data=body,
+            headers=headers,
+            stream=True,
+            catch_response=True,
+            name=headers_name,
+        ) as resp:
+            if resp.status_code != 200:
+                resp.failure(f"Status {resp.status_code}")
+                fire(
+                    total_name,
+                    (pc() - start) * 1000,
+                    rtype=total_rtype,
+                    exc=Exception(f"Status {resp.status_code}"),
+                )
+                return
+            if record_cost_headers:
+                record_proxy_cost(resp)
+            first_chunk_time, got_done = consume_sse(resp, done_marker)
+            if got_done:
+                resp.success()
+            else:
+                resp.failure("Stream ended before done marker")
+
+        end = pc()
+        if first_chunk_time is not None:
+            fire(ttfb_name, (first_chunk_time - start) * 1000)
+        fire(
+            total_name,
+            (end - start) * 1000,
+            rtype=total_rtype,
+            exc=None if got_done else Exception("Stream ended before done marker"),
+        )
+    except Exception as e:
+        fire(total_name, (pc() - start) * 1000, rtype=total_rtype, exc=e)
@@ -0,0 +1,192 @@
+"""
+Locust cache-workload test for qlite proxy.
+
+Drives a mixed hit/miss workload against the exact cache:
+  - CACHE_HIT_RATE% of tasks replay one of 10 fixed pool prompts
+    (cache HITs once warmed)
+  - the rest send a unique prompt (guaranteed MISS)
+
+Usage:
+  # Terminal 1: go run ./cmd/mockserver/ -port 9999 -latency 50ms
+  # Terminal 2: QLITE_CONFIG=config/config.mock.yaml go run ./cmd/proxy/
+  # Terminal 3:
+  locust -f loadtest/cache_locustfile.py --host http://localhost:8080 \
+    --users 20 --spawn-rate 5 --run-time 60s --headless
+
+Compare "cache [expect-HIT]" vs "cache [MISS]" latencies; the Cost Savings
+Summary at test stop reports the observed hit rate against CACHE_HIT_RATE.
+"""
+
+import array
+import itertools
+import os
+import random
+import threading
+
+import gevent.event
+import gevent.pool
+from locust import FastHttpUser, between, task, events
+
+from _common import (
+    HEADERS,
+    MODEL,
+    chat_body,
+    dumps_bytes,
+    print_cost_summary,
+    record_proxy_cost,
+)
+
+
+CACHE_HIT_RATE = int(os.getenv("CACHE_HIT_RATE", "70"))
+
+# /health costs the proxy almost nothing, so mixing it into the task weights
+# just dilutes the cache traffic and skews aggregated latency stats downward.
+# Liveness is verified once at warmup; set QLITE_HEALTH_WEIGHT > 0 to also
+# keep periodic probes in the mix.
+HEALTH_WEIGHT = int(os.getenv("QLITE_HEALTH_WEIGHT", "0"))
+
+# Fixed prompts that warmup seeds into the exact cache. Content must be
+# byte-identical across tasks for the SHA-256 cache key to match.
+CACHE_POOL = tuple(
+    [{"role": "user", "content": f"Cache pool message {i}: say hello in one word."}]
+    for i in range(10)
+)
+
+# Pool payloads are constant — serialize once at import.
+_POOL_BODIES = tuple(chat_body(m) for m in CACHE_POOL)
+_POOL_LEN = len(_POOL_BODIES)
+
+# Deterministic hit/miss schedule: one array index per task replaces two RNG
+# calls, and every run sees the same sequence, so A/B comparisons of proxy
+# changes aren't subject to hit-rate noise. 0xFF marks a miss; any other
+# value is a pool index.
+_MISS = 0xFF
+_SCHEDULE_LEN = 10_000
+
+
+def _build_schedule():
+    rng = random.Random(1337)  # fixed seed for run-to-run reproducibility
+    threshold = CACHE_HIT_RATE / 100.0
+    return array.array(
+        "B",
+        (
+            rng.randrange(_POOL_LEN) if rng.random() < threshold else _MISS
+            for _ in range(_SCHEDULE_LEN)
+        ),
+    )
+
+
+_SCHEDULE = _build_schedule()
+
+# Users start at spread-out offsets in the schedule so they don't march in
+# lockstep; 997 is coprime with the schedule length.
+_user_seq = itertools.count()
+
+_miss_counter = itertools.count(1)
+
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    print_cost_summary(target_hit_rate=CACHE_HIT_RATE)
+
+
+# ---------------------------------------------------------------------------
+# Locust user
+# ---------------------------------------------------------------------------
+
+# The cache is process-global on the proxy, so warming it is a per-test job,
+# not a per-user one. The first user to spawn owns a shared promise and
+# performs warmup; everyone else awaits the same in-flight result instead of
+# re-POSTing identical pool bodies (request coalescing). This also means no
+# user starts its task loop against a cold cache.
+_warmup_lock = threading.Lock()
+_warmup_result = None
+
+
+class CacheUser(FastHttpUser):
+    wait_time = between(0.1, 0.5)
+    network_timeout = 10.0
+    connection_timeout = 10.0
+
+    def on_start(self):
+        global _warmup_result
+        self._sched_i = next(_user_seq) * 997 % _SCHEDULE_LEN
+        with _warmup_lock:
+            result = _warmup_result
+            owner = result is None
+            if owner:
+                result = _warmup_result = gevent.event.AsyncResult()
+        if not owner:
+            result.get(timeout=30)
+            return
+        try:
+            # Single liveness probe before seeding the cache — fails fast if
+            # the proxy isn't up, without weighting /health into the workload.
+            self.client.get("/health", name="health")
+            # Locust runs each user in its own greenlet, so the warmup POSTs
+            # can fan out through a child pool — ~1 RTT instead of 10 serial.
+            pool = gevent.pool.Pool(len(_POOL_BODIES))
+            pool.map(
+                lambda body: self.client.post(
+                    "/v1/chat/completions", data=body, headers=HEADERS, name="[warmup]"
+                ),
+                _POOL_BODIES,
+            )
+            result.set(True)
+        except Exception as e:
+            result.set_exception(e)
+            raise
+
+    @task(10)
+    def cache_request(self):
+        """Weighted hit/miss traffic against the exact cache."""
+        i = self._sched_i
+        self._sched_i = (i + 1) % _SCHEDULE_LEN
+        idx = _SCHEDULE[i]
+        if idx != _MISS:
+            body = _POOL_BODIES[idx]
+            name = "cache [expect-HIT]"
+        else:
+            uid = next(_miss_counter)
+            body = dumps_bytes(
+                {
+                    "model": MODEL,
+                    "messages": [
+                        {"role": "user", "content": f"Unique miss message {uid}"}
+                    ],
+                    "max_tokens": 10,
+                }
+            )
+            name = "cache [MISS]"
+
+        with self.client.post(
+            "/v1/chat/completions",
+            data=body,
+            headers=HEADERS,
+            catch_response=True,
+            name=name,
+        ) as resp:
+            if resp.status_code == 200:
+                record_proxy_cost(resp)
+                # Substring scan (C-level memmem) instead of a full JSON
+                # parse — the body is otherwise unused here, and at high hit
+                # rates the parse would be the client's dominant CPU cost.
+                raw = resp.content
+                if b'"choices"' not in raw:
+                    resp.failure("No choices in response")
+                elif b'"choices":[]' in raw or b'"choices": []' in raw:
+                    resp.failure("Empty choices")
+                else:
+                    resp.success()
+            else:
+                # Slice bytes first, then decode: resp.text would UTF-8 decode the
+                # whole error body just to keep a 200-char snippet.
+                resp.failure(
+                    f"Status {resp.status_code}: "
+                    f"{resp.content[:200].decode('utf-8', 'replace')}"
+                )
+
+    @task(HEALTH_WEIGHT)
+    def health_check(self):
+        """Periodic proxy liveness probe (opt-in via QLITE_HEALTH_WEIGHT)."""
+        self.client.get("/health", name="health")
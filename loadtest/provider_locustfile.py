@@ -0,0 +1,169 @@
+"""
+Locust multi-provider streaming test for qlite proxy.
+
+Measures per-provider translation overhead: every provider gets a proxied
+streaming task (client speaks OpenAI format, proxy translates) and a
+direct-to-mock baseline in the provider's native API format. Comparing
+TTFB [proxy-X-stream] vs TTFB [direct-X-stream] isolates what each
+translation layer costs.
+
+Usage:
+  # Terminal 1: go run ./cmd/mockserver/ -port 9999 -latency 50ms
+  # Terminal 2: QLITE_CONFIG=config/config.mock.yaml go run ./cmd/proxy/
+  # Terminal 3:
+  locust -f loadtest/provider_locustfile.py --host http://localhost:8080 \
+    --users 20 --spawn-rate 5 --run-time 60s --headless
+
+FastHttpUser keeps the load generator cheap; stream framing differs per
+provider (OpenAI ends with `data: [DONE]`, Anthropic with an
+`event: message_stop` line, Gemini at EOF) and is handled by the
+done_marker argument to run_stream.
+"""
+
+import os
+import random
+import sys
+
+from locust import FastHttpUser, between, task
+
+from _common import API_KEY, DONE, HEADERS, dumps_bytes, run_stream
+
+
+MOCK_URL = os.getenv("MOCK_URL", "http://localhost:9999")
+
+# One model per provider, matching the routes in config.mock.yaml.
+OPENAI_MODEL = os.getenv("QLITE_OPENAI_MODEL", "gpt-4o-mini")
+ANTHROPIC_MODEL = os.getenv("QLITE_ANTHROPIC_MODEL", "claude-haiku-4-5")
+GOOGLE_MODEL = os.getenv("QLITE_GOOGLE_MODEL", "gemini-2.5-flash")
+
+PROMPT = "Say hello in one word."
+
+# Anthropic native framing: ends with an event line, not [DONE].
+_ANTHROPIC_DONE = b"event: message_stop"
+
+ANTHROPIC_HEADERS = {
+    "Content-Type": "application/json",
+    "x-api-key": API_KEY,
+    "anthropic-version": "2023-06-01",
+    "Accept-Encoding": "identity",
+    "Connection": "keep-alive",
+}
+
+
+def _openai_stream_body(model):
+    return dumps_bytes({
+        "model": model,
+        "messages": [{"role": "user", "content": PROMPT}],
+        "max_tokens": 10,
+        "stream": True,
+    })
+
+
+# All payloads are constant — serialized once at import.
+_PROXY_BODIES = {
+    "openai": _openai_stream_body(OPENAI_MODEL),
+    "anthropic": _openai_stream_body(ANTHROPIC_MODEL),
+    "google": _openai_stream_body(GOOGLE_MODEL),
+}
+
+_ANTHROPIC_NATIVE_BODY = dumps_bytes({
+    "model": ANTHROPIC_MODEL,
+    "messages": [{"role": "user", "content": PROMPT}],
+    "max_tokens": 4096,
+    "stream": True,
+})
+
+_GOOGLE_NATIVE_BODY = dumps_bytes({
+    "contents": [{"role": "user", "parts": [{"text": PROMPT}]}],
+})
+
+_GOOGLE_STREAM_URL = (
+    f"{MOCK_URL}/v1beta/models/{GOOGLE_MODEL}:streamGenerateContent"
+    f"?alt=sse&key={API_KEY}"
+)
+
+
+# One spec per provider instead of one @task method per provider: the six
+# near-identical methods collapse into two parametrized tasks. Metric-name
+# strings are built once and interned, so events.request.fire compares them
+# by pointer against the stats-dict keys instead of re-hashing per event.
+
+# (body, headers_name, ttfb_name, total_name)
+_PROXY_SPECS = tuple(
+    (
+        _PROXY_BODIES[p],
+        sys.intern(f"proxy-{p} [stream]"),
+        sys.intern(f"TTFB [proxy-{p}-stream]"),
+        sys.intern(f"total [proxy-{p}-stream]"),
+    )
+    for p in ("openai", "anthropic", "google")
+)
+
+# (url, body, headers, done_marker, headers_name, ttfb_name, total_name)
+_DIRECT_SPECS = (
+    (
+        f"{MOCK_URL}/v1/chat/completions",
+        _PROXY_BODIES["openai"],
+        HEADERS,
+        DONE,
+        sys.intern("direct-openai [stream]"),
+        sys.intern("TTFB [direct-openai-stream]"),
+        sys.intern("total [direct-openai-stream]"),
+    ),
+    (
+        f"{MOCK_URL}/v1/messages",
+        _ANTHROPIC_NATIVE_BODY,
+        ANTHROPIC_HEADERS,
+        _ANTHROPIC_DONE,
+        sys.intern("direct-anthropic [stream]"),
+        sys.intern("TTFB [direct-anthropic-stream]"),
+        sys.intern("total [direct-anthropic-stream]"),
+    ),
+    (
+        _GOOGLE_STREAM_URL,
+        _GOOGLE_NATIVE_BODY,
+        HEADERS,
+        None,
+        sys.intern("direct-google [stream]"),
+        sys.intern("TTFB [direct-google-stream]"),
+        sys.intern("total [direct-google-stream]"),
+    ),
+)
+
+
+class ProviderUser(FastHttpUser):
+    wait_time = between(0.5, 2)
+    network_timeout = 10.0
+    connection_timeout = 10.0
+
+    @task(3)
+    def proxied_stream(self):
+        """Streaming via proxy; OpenAI format, translated per provider."""
+        body, headers_name, ttfb_name, total_name = random.choice(_PROXY_SPECS)
+        run_stream(
+            self.client,
+            "/v1/chat/completions",
+            body,
+            headers_name=headers_name,
+            ttfb_name=ttfb_name,
+            total_name=total_name,
+            record_cost_headers=True,
+        )
+
+    @task(3)
+    def direct_stream(self):
+        """Direct-to-mock baseline in the provider's native API format."""
+        url, body, headers, done, headers_name, ttfb_name, total_name = (
+            random.choice(_DIRECT_SPECS)
+        )
+        run_stream(
+            self.client,
+            url,
+            body,
+            headers_name=headers_name,
+            ttfb_name=ttfb_name,
+            total_name=total_name,
+            total_rtype="POST",
+            headers=headers,
+            done_marker=done,
+        )
@@ -0,0 +1,407 @@
+"""
+Locust semantic-cache workload test for qlite proxy.
+
+Drives a three-way traffic mix against the exact + semantic cache layers:
+  - EXACT_HIT_RATE% replay a fixed pool prompt byte-for-byte (exact HIT)
+  - SEMANTIC_HIT_RATE% send a paraphrase of a warmed prompt (semantic HIT)
+  - the rest send a unique prompt (guaranteed MISS)
+
+Requires the semantic cache enabled in the proxy config (cache.semantic)
+with Qdrant and an embeddings endpoint reachable.
+
+Usage:
+  # Terminal 1: go run ./cmd/mockserver/ -port 9999 -latency 50ms
+  # Terminal 2: QLITE_CONFIG=config/config.mock.yaml go run ./cmd/proxy/
+  #             (with cache.semantic.enabled: true)
+  # Terminal 3:
+  locust -f loadtest/semantic_locustfile.py --host http://localhost:8080 \
+    --users 20 --spawn-rate 5 --run-time 60s --headless
+
+The proxy classifies each response via headers: X-Cache: HIT with
+X-Provider: cache is an exact hit, X-Provider: semantic_cache is a
+semantic hit, anything else is a miss. The Semantic Cache Summary at test
+stop reports the observed split against the configured rates.
+"""
+
+import collections
+import itertools
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+import gevent.pool
+import requests
+from locust import FastHttpUser, between, task, events
+
+from _common import HEADERS, chat_body, fire
+
+
+def _body_for(content):
+    return chat_body([{"role": "user", "content": content}])
+
+
+EXACT_HIT_RATE = int(os.getenv("EXACT_HIT_RATE", "40"))
+SEMANTIC_HIT_RATE = int(os.getenv("SEMANTIC_HIT_RATE", "30"))
+
+# The proxy exposes no cache-introspection endpoint, so warmup readiness is
+# observed at the source: Qdrant's collection info reports points_count.
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "qlite_cache")
+
+# Prompts replayed byte-for-byte — exact-cache hits once warmed.
+EXACT_POOL = tuple(
+    f"Exact pool message {i}: say hello in one word." for i in range(10)
+)
+
+# Base prompts seeded into the semantic cache at warmup, each with
+# paraphrases that should land within the similarity threshold. Modeled on
+# the groups in semantic_realtest.go.
+SEMANTIC_POOL = [
+    {
+        "base": "Say hello in exactly three words.",
+        "variants": [
+            "Please say hello using exactly three words.",
+            "Greet me with a hello that is exactly three words long.",
+        ],
+    },
+    {
+        "base": "What is the capital of France?",
+        "variants": [
+            "Tell me the capital city of France.",
+            "Which city is the capital of France?",
+        ],
+    },
+    {
+        "base": "Explain what a reverse proxy does in one sentence.",
+        "variants": [
+            "In a single sentence, what does a reverse proxy do?",
+            "Describe the job of a reverse proxy in one sentence.",
+        ],
+    },
+    {
+        "base": "List three primary colors.",
+        "variants": [
+            "Name three primary colors.",
+            "What are three of the primary colors?",
+        ],
+    },
+    {
+        "base": "How many days are there in a leap year?",
+        "variants": [
+            "What is the number of days in a leap year?",
+            "A leap year has how many days?",
+        ],
+    },
+]
+
+# Pool prompts never change after import — serialize once and POST the raw
+# bytes with data= instead of re-running json.dumps per request. Byte-for-
+# byte identical bodies are also what the exact cache keys on.
+_EXACT_BODIES = tuple(_body_for(c) for c in EXACT_POOL)
+_WARMUP_BODIES = _EXACT_BODIES + tuple(_body_for(g["base"]) for g in SEMANTIC_POOL)
+
+# Variants are constant too — a flat list so the task picks one with a
+# single random.choice instead of building a payload dict per request.
+# Only the unique-miss payload remains dynamic.
+_VARIANT_BODIES = tuple(_body_for(v) for g in SEMANTIC_POOL for v in g["variants"])
+
+# Body picks are prefetched in per-user stacks that amortize one
+# random.choices call over _BATCH draws; the hit/semantic/miss split
+# itself is Locust's weighted task scheduler (see the @task weights).
+_BATCH = 1024
+
+# Miss IDs come from itertools.count — the increment is atomic at the C
+# level, so no lock is needed even with many concurrent greenlets. Binding
+# __next__ directly skips a Python wrapper frame per miss.
+_next_miss_id = itertools.count(1).__next__
+
+# Miss payloads differ only in the id embedded in the content string, so
+# the JSON envelope is serialized once around a placeholder and the id is
+# spliced in as bytes — no json.dumps on the miss path. (Caching whole
+# payloads per id would never pay off: ids are unique within a run.)
+_MISS_PREFIX, _MISS_SUFFIX = chat_body(
+    [{"role": "user", "content": "Unique semantic miss message __MISS_ID__"}]
+).split(b"__MISS_ID__")
+
+
+def _miss_body(uid):
+    return _MISS_PREFIX + b"%d" % uid + _MISS_SUFFIX
+
+
+# Per-kind counts are lock-free: `Counter[key] += 1` is a single
+# STORE_SUBSCR under the GIL, so greenlets can't interleave mid-increment.
+# The float accumulators aren't atomic under `+=`, so instead of a lock
+# each greenlet gets its own accumulator (threading.local is greenlet-
+# local under Locust's monkey-patching) and the partials are merged once
+# at test stop. list.append is atomic, so registration needs no lock.
+_counts = collections.Counter()
+_tls = threading.local()
+_all_locals = []
+
+
+class _Stats:
+    """Per-greenlet cost accumulator.
+
+    Slotted so field updates are fixed-offset attribute stores instead of
+    dict hashing. A plain class rather than dataclass(slots=True) because
+    the loadtest README promises Python 3.8+ and dataclass slots need 3.10.
+    """
+
+    __slots__ = ("cost", "saved")
+
+    def __init__(self):
+        self.cost = 0.0
+        self.saved = 0.0
+
+
+def _local_stats():
+    s = getattr(_tls, "stats", None)
+    if s is None:
+        s = _tls.stats = _Stats()
+        _all_locals.append(s)
+    return s
+
+
+# Header pair → stat key; tuple keys hash once instead of the chain of
+# string compares an if/elif ladder pays per request.
+_DISPATCH = {
+    ("HIT", "semantic_cache"): "semantic",
+    ("HIT", "cache"): "exact",
+}
+
+
+# Raw per-request cost samples by kind, kept for distribution stats in the
+# summary. list.append is atomic, so greenlets share these lock-free; all
+# the math is deferred to on_test_stop where it runs once.
+_cost_samples = {"exact": [], "semantic": [], "miss": []}
+
+
+def record_result(cache_header, provider_header, cost, cost_saved):
+    key = _DISPATCH.get((cache_header, provider_header), "miss")
+    _counts[key] += 1
+    _cost_samples[key].append(cost)
+    s = _local_stats()
+    s.cost += cost
+    s.saved += cost_saved
+
+
+# The caches being warmed live in the proxy (and Qdrant), so warmup is a
+# per-test job, not a per-user one: seeding from every user multiplies the
+# identical POSTs and the Qdrant upsert work by the user count. test_start
+# runs once before users spawn; the Event is belt-and-braces for on_start.
+_warmup_done = threading.Event()
+
+
+def _qdrant_points(session):
+    """Current points_count of the collection, or None if unobservable."""
+    try:
+        r = session.get(
+            f"{QDRANT_URL}/collections/{QDRANT_COLLECTION}", timeout=2
+        )
+        if r.ok:
+            return r.json().get("result", {}).get("points_count") or 0
+    except requests.RequestException:
+        pass
+    return None
+
+
+def _wait_for_qdrant(session, expected, deadline_s=10.0):
+    """Poll until points_count reaches expected, with capped backoff."""
+    deadline = time.monotonic() + deadline_s
+    delay = 0.02
+    while time.monotonic() < deadline:
+        count = _qdrant_points(session)
+        if count is not None and count >= expected:
+            return
+        time.sleep(delay)
+        delay = min(delay * 1.5, 0.1)
+
+
+_seeded = False
+
+
+@events.test_start.add_listener
+def seed_caches(environment, **kwargs):
+    # test_start fires again on web-UI restarts; the proxy-side caches
+    # survive those, so re-seeding would just replay 15 redundant POSTs.
+    global _seeded
+    if _seeded:
+        _warmup_done.set()
+        return
+    _seeded = True
+    session = requests.Session()
+    base = environment.host.rstrip("/")
+    before = _qdrant_points(session)
+    pool = gevent.pool.Pool(len(_WARMUP_BODIES))
+    pool.map(
+        lambda body: session.post(
+            f"{base}/v1/chat/completions", data=body, headers=HEADERS, timeout=10
+        ),
+        _WARMUP_BODIES,
+    )
+    # Qdrant upserts happen async after the response is written. Poll the
+    # collection until at least the base prompts are visible instead of
+    # sleeping a pessimistic fixed interval; on a local Qdrant this exits
+    # in well under a second.
+    if before is None:
+        # Qdrant unobservable (unreachable, or the proxy hasn't created
+        # the collection yet) — fall back to the fixed settle.
+        time.sleep(3)
+    else:
+        _wait_for_qdrant(session, before + len(SEMANTIC_POOL))
+    _warmup_done.set()
+
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    # Every module-global read below is pinned to a local up front:
+    # LOAD_FAST instead of a namespace-dict lookup per use. Once-per-test
+    # code, but it keeps the whole file on the same convention as the
+    # hot paths.
+    counts = _counts
+    out = sys.stdout
+    exact = counts["exact"]
+    semantic = counts["semantic"]
+    misses = counts["miss"]
+    total = exact + semantic + misses
+
+    # One joined write instead of a print per line: the block lands in a
+    # single syscall, so distributed runs can't interleave other workers'
+    # output mid-summary.
+    lines = ["", "=== Semantic Cache Summary ==="]
+    if total == 0:
+        lines += ["No proxy requests recorded.", "==============================", ""]
+        out.write("\n".join(lines))
+        out.flush()
+        return
+    all_locals = _all_locals
+    total_cost = sum(s.cost for s in all_locals)
+    total_saved = sum(s.saved for s in all_locals)
+    cost_without_cache = total_cost + total_saved
+    savings_pct = (total_saved / cost_without_cache * 100) if cost_without_cache > 0 else 0.0
+    lines += [
+        f"Target rates:            exact {EXACT_HIT_RATE}% / semantic {SEMANTIC_HIT_RATE}%",
+        f"Exact hits:              {exact} ({exact / total * 100:.1f}%)",
+        f"Semantic hits:           {semantic} ({semantic / total * 100:.1f}%)",
+        f"Misses:                  {misses} ({misses / total * 100:.1f}%)",
+    ]
+    cost_samples = _cost_samples
+    quantiles = statistics.quantiles
+    fmean = statistics.fmean
+    for kind, label in (("exact", "Exact"), ("semantic", "Semantic"), ("miss", "Miss")):
+        samples = cost_samples[kind]
+        if len(samples) >= 2:
+            q = quantiles(samples, n=100)
+            lines.append(
+                f"{label + ' cost/request:':<25}"
+                f"mean ${fmean(samples):.8f} / "
+                f"p50 ${q[49]:.8f} / p99 ${q[98]:.8f}"
+            )
+    lines += [
+        f"Total API cost (actual): ${total_cost:.8f}",
+        f"Total saved:             ${total_saved:.8f}",
+        f"Savings:                 {savings_pct:.1f}%",
+        "==============================",
+        "",
+    ]
+    out.write("\n".join(lines))
+    out.flush()
+
+
+class SemanticCacheUser(FastHttpUser):
+    wait_time = between(0.1, 0.5)
+    network_timeout = 10.0
+    connection_timeout = 10.0
+
+    def on_start(self):
+        # Per-user RNG: the module-level random functions all funnel
+        # through one shared Mersenne Twister instance; a private instance
+        # keeps each greenlet's draws independent of the others.
+        self._rng = random.Random(os.urandom(8))
+        # Invariants bound to the instance: attribute loads on self are
+        # cheaper than module-global lookups in the task body.
+        self._url = "/v1/chat/completions"
+        self._headers = HEADERS
+        self._name_exact = "[cache-exact-HIT]"
+        self._name_semantic = "[cache-semantic-HIT]"
+        self._name_miss = "[cache-MISS]"
+        self._exact_batch = []
+        self._variant_batch = []
+        _warmup_done.wait(timeout=30)
+
+    # Locust's scheduler performs the weighted pick between the three tasks,
+    # so no per-request kind dispatch runs in the task bodies at all; each
+    # one is a straight-line specialization of its traffic kind.
+
+    @task(EXACT_HIT_RATE)
+    def exact_hit(self):
+        """Replay a warmed pool prompt byte-for-byte (exact-cache HIT)."""
+        batch = self._exact_batch
+        if not batch:
+            batch = self._exact_batch = self._rng.choices(_EXACT_BODIES, k=_BATCH)
+        self._post(batch.pop(), self._name_exact)
+
+    @task(SEMANTIC_HIT_RATE)
+    def semantic_hit(self):
+        """POST a paraphrase of a warmed prompt (semantic-cache HIT)."""
+        batch = self._variant_batch
+        if not batch:
+            batch = self._variant_batch = self._rng.choices(_VARIANT_BODIES, k=_BATCH)
+        self._post(batch.pop(), self._name_semantic)
+
+    @task(100 - EXACT_HIT_RATE - SEMANTIC_HIT_RATE)
+    def miss_request(self):
+        """POST a unique prompt (guaranteed MISS on both cache layers)."""
+        self._post(_miss_body(_next_miss_id()), self._name_miss)
+
+    def _post(self, body, name):
+        """One chat-completion POST plus header classification.
+
+        Shared across the three tasks so the response handling is a single
+        code object — CPython 3.11+ specializes it once, not per copy.
+        """
+        # No catch_response: Locust already fails non-2xx and succeeds 2xx on
+        # its own, so the common good-response path skips the
+        # ResponseContextManager allocation and __enter__/__exit__ pair. Only
+        # the rare 200-with-bad-body case needs a supplementary failure event.
+        start = time.perf_counter()
+        resp = self.client.post(
+            self._url,
+            data=body,
+            headers=self._headers,
+            name=name,
+        )
+        if resp.status_code != 200:
+            return
+        h = resp.headers
+        cache_header = h.get("X-Cache", "MISS")
+        cost_hdr = h.get("X-Request-Cost")
+        cost = float(cost_hdr) if cost_hdr else 0.0
+        if cache_header == "HIT":
+            provider_header = h.get("X-Provider", "")
+            saved_hdr = h.get("X-Cost-Saved")
+            cost_saved = float(saved_hdr) if saved_hdr else 0.0
+        else:
+            # Misses never carry savings; skip two header lookups
+            # and a float parse on ~30% of traffic.
+            provider_header = ""
+            cost_saved = 0.0
+        record_result(cache_header, provider_header, cost, cost_saved)
+        # Substring scan (C-level memmem) instead of a full JSON
+        # parse — the body is otherwise unused here, and on cache
+        # hits the parse would dominate the client-side cost.
+        raw = resp.content
+        if (
+            b'"choices"' not in raw
+            or b'"choices":[]' in raw
+            or b'"choices": []' in raw
+        ):
+            fire(
+                name,
+                (time.perf_counter() - start) * 1000,
+                rtype="POST",
+                exc=Exception("No choices in response"),
+            )